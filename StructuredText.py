@@ -45,7 +45,16 @@ __version__ = '0.8.31'
 
 import os
 import sys
-import re
+import itertools
+import functools
+
+# Buffer size for file reads; large block reads amortise syscalls on
+# big or network-mounted files.
+_IO_BUFFER_SIZE = 1 << 20
+
+# Characters `str.splitlines()` splits on, less '\r', which text 
+# mode files translate to '\n' on reading.
+_LINE_BREAKS = '\n\v\f\x1c\x1d\x1e\x85\u2028\u2029'
 
 class StructuredTextError(Exception):
     pass
@@ -59,11 +68,72 @@ class DuplicateKeyError(StructuredTextError):
 class FileNotFoundError(StructuredTextError):
     pass
 
+def _iter_file_blocks(file_path:str):
+  """
+    Yield the lines of `file_path` in lists, one list per block 
+    read, split exactly as `str.splitlines()` would split the 
+    whole file.
+  """
+  try:
+    f = open(file_path, 'r', buffering=_IO_BUFFER_SIZE)
+  except IOError:
+    raise FileNotFoundError(f"File '{file_path}' could not be opened")
+  with f:
+    partial = ''
+    while block := f.read(_IO_BUFFER_SIZE):
+      lines = (partial + block).splitlines()
+      # a block that does not end on a line break ends mid-line;
+      # carry that partial line over to the next block
+      partial = '' if block[-1] in _LINE_BREAKS else lines.pop()
+      yield lines
+    if partial:
+      yield [partial]
+
+def _from_file(file_path:str | os.PathLike) -> tuple:
+  """ Return the lines, items and source description of a file. """
+  source = f"file '{file_path}'"
+  if not os.path.isfile(file_path):
+    raise FileNotFoundError(f"No such {source}")
+  # lines are streamed from the file a block at a time, rather 
+  # than read in whole
+  return itertools.chain.from_iterable(_iter_file_blocks(file_path)), (), source
+
+def _from_list(lines:list[str]) -> tuple:
+  """ Return the lines, items and source description of a list. """
+  return lines, (), 'list'
+
+def _from_dict(variables:dict) -> tuple:
+  """ 
+    Return the lines, items and source description of a dict.
+    A dict is already key:value, so it has no lines; `extract` 
+    validates and stores its (key, value) items directly.
+  """
+  return (), variables.items(), 'dictionary'
+
+# `extract` input handlers, keyed on the type of `input_source`.
+# os.PathLike (eg, pathlib.Path) is only ever matched by isinstance().
+_DISPATCH = {
+  str:          _from_file, 
+  list:         _from_list, 
+  dict:         _from_dict, 
+  os.PathLike:  _from_file,
+}
+
+def _source_handler(input_source):
+  """ Return the `_DISPATCH` handler for `input_source`. """
+  handler = _DISPATCH.get(type(input_source))
+  if handler is None:
+    # fall back to isinstance() so that subclasses are accepted
+    for kind, handler in _DISPATCH.items():
+      if isinstance(input_source, kind): return handler
+    raise InvalidInputTypeError(f"Invalid type in 'input_source' ('filename', list, or dict)")
+  return handler
+
 def extract(
-    input_source: str | dict | list[str], 
+    input_source: str | os.PathLike | dict | list[str], 
     *, 
-    keyvars:list[str] | None  = [], 
-    delvars:list[str] | None  = [],
+    keyvars:list[str] | None  = None, 
+    delvars:list[str] | None  = None,
     keyval_sep:str       = ':',    
     quiet: bool          = False, 
     strict: bool         = False, 
@@ -102,13 +172,17 @@ def extract(
   '_FREETEXT_'.
 
   Args:
-    input_source:   If `str`, denotes a filename to read.
+    input_source:   If `str` or path-like, denotes a filename 
+                    to read.
                     If `dict`|`list`, denotes a dictionary or list. 
-    keyvar:         If specified, only the `keyvar` variable from 
-                    the list will be returned. 
+    keyvars:        If specified, only the variables named in the
+                    `keyvars` list will be returned. The list 
+                    itself is not modified.
                     Otherwise, all variables will be returned. 
     keyval_sep:     Separator string between `key` and `value`. 
-                    Default ':'.
+                    Default ':'. Must not be empty or start with 
+                    an ASCII letter, digit or '_', else 
+                    `StructuredTextError` is raised.
     delvars:        If a `list` of variables to remove from the 
                     output.
     quiet:          If True, warnings are not displayed. 
@@ -200,180 +274,271 @@ def extract(
   ```
   """
 
-  source      = ''
-  lines:list  = []
-  if type(input_source) == str:
-    file_path = input_source
-    source    = f"file '{file_path}'"
-    if not os.path.isfile(file_path):
-      raise FileNotFoundError(f"No such {source}")
-    try:
-      with open(file_path, 'r') as f:
-        file_content = f.read()
-    except FileNotFoundError:
-      raise FileNotFoundError(f"File '{file_path}' not found")
-    except IOError:
-      raise FileNotFoundError(f"File '{file_path}' could not be opened")
-    # read text into lines list
-    lines = file_content.splitlines()
-  elif type(input_source) == list:
-    source  = 'list'
-    lines   = input_source
-  elif type(input_source) == dict:
-    source = 'dictionary'
-    for key, value in input_source.items():
-      if '\n' in value:
-        lines.append(f'{key}:"""')
-        lines.extend(value.splitlines())
-        lines.append('"""')
-      else:
-        lines.append(f'{key}:{value}')
-  else:
-    raise InvalidInputTypeError(f"Invalid type in 'input_source' ('filename', list, or dict)")
+  lines, items, source = _source_handler(input_source)(input_source)
 
   variables:dict    = {}
-  FREETEXT          = ''
+  freetext_chunks:list[str] = []
+  # freetext_name must match [a-zA-Z][a-zA-Z0-9_]*
   if freetext_name != '_FREETEXT_' \
-      and not re.compile(r'^([a-zA-Z][a-zA-Z0-9_]*)$').match(freetext_name):
+      and not (freetext_name.isascii() and freetext_name.isidentifier() 
+               and freetext_name[0] != '_'):
     raise StructuredTextError(f"Invalid freetext_name '{freetext_name}'")
-  ERRORS            = ''
+  # keyval_sep must not be mistakable for part of a key
+  sep0 = keyval_sep[:1]
+  if not sep0 or sep0 == '_' or (sep0.isascii() and sep0.isalnum()):
+    raise StructuredTextError(f"Invalid keyval_sep '{keyval_sep}'")
+  errors:list[str]  = []
   current_var_name  = ''
   current_var_value = ''
+  current_var_chunks:list[str] = []
   multiline:bool    = False
-  keyvar            = True if keyvars else False
-  key_value_pattern = re.compile(r'^([a-zA-Z_][a-zA-Z0-9_]*)\s*' + re.escape(keyval_sep) + r'\s*(.*)$')
+  # keyvars still to be found; a set gives O(1) lookup and removal
+  keyvars_remaining:set = set(keyvars) if keyvars else set()
+  keyvar            = bool(keyvars_remaining)
+  sep_len:int       = len(keyval_sep)
 
   comment_n:int     = 0
   verbose:bool      = not quiet
 
-  for line in lines:
-    if multiline:
-      if re.search(r'^\s*\"\"\"\s*$', line):
-        # r'^\s*\"\"\"\s*$' marks the end of a multiline variable
-        if keyvars:
-          if current_var_name in keyvars:
-            variables[current_var_name] = current_var_value
-            keyvars.remove(current_var_name)
-            # shortcut exit if keyvars is now empty 
-            if not keyvars: return variables
-        else:
-          variables[current_var_name] = current_var_value
-        current_var_name  = ''
-        current_var_value = ''
-        multiline         = False
+  # bind hot-loop methods to locals once, rather than per line
+  append_chunk      = current_var_chunks.append
+  append_freetext   = freetext_chunks.append
+
+  # Warnings for stderr are collected and written in one batch on
+  # the way out, whether returning or raising.
+  stderr_msgs:list[str] = []
+
+  # Key checks and storage shared by dict items and lines
+  def duplicate_key(key:str):
+    """ Report `key` as already stored. """
+    errmsg = f"Duplicate key '{key}' in {source}"
+    if verbose or strict: stderr_msgs.append(errmsg + '\n')
+    if strict:
+      raise StructuredTextError(errmsg)
+    errors.append(errmsg)
+
+  def store(key:str, value:str) -> bool:
+    """ Store `key`, if wanted; return True once all keyvars are found. """
+    if not keyvar:
+      variables[key] = value
+    elif key in keyvars_remaining:
+      variables[key] = value
+      keyvars_remaining.remove(key)
+      return not keyvars_remaining
+    return False
+
+  def no_key(text:str, first_line:str):
+    """ Report `text` as having no key, and keep it as free text. """
+    # free text is never returned when selecting keyvars
+    if keyvar and not strict: return
+    errmsg = f"No variable key in '{first_line[:40]}...' in {source}"
+    if (verbose or strict) and not keyvar: 
+      stderr_msgs.append(errmsg + '\n')
+    if strict:
+      raise StructuredTextError(errmsg)
+    errors.append(errmsg)
+    append_freetext(text)
+
+  try:
+    # Dict items are already key:value, so they are validated and 
+    # stored directly rather than rendered to lines and re-parsed.
+    for key, value in items:
+      # as for lines, blanks between key and keyval_sep are ignored
+      name = key.rstrip() if isinstance(key, str) else ''
+      if not (name.isascii() and name.isidentifier()):
+        # item has no valid key, dump to FREETEXT if not strict mode,
+        # with line ends normalised; it is reported by its first line
+        text = f'{key}{keyval_sep}' + '\n'.join(value.splitlines())
+        no_key(text, text.partition('\n')[0])
+        continue
+      if name in variables: duplicate_key(name)
+      if '\n' in value:
+        # normalise line ends and drop leading empty lines, as for 
+        # multiline values that are read from lines
+        value = '\n'.join(value.splitlines()).lstrip('\n')
       else:
-        current_var_value += ('\n' if current_var_value else '') + line
-    else:
-      if line.strip() == '':
+        value = value.strip()
+      # shortcut exit if keyvars is now empty 
+      if store(name, value): return variables
+
+    # Multiline bodies are consumed by an inner loop that shares 
+    # `line_iter`, so body lines skip the declaration checks.
+    line_iter = iter(lines)
+    for line in line_iter:
+      ls = line.lstrip()
+      if not ls:
         # Ignore all blank lines between keyvar declarations
         continue
-      if line.lstrip().startswith('#'):
-        if no_comments or keyvars: continue
-        # Create `_COMMENT_?` variable from lines starting with '#'
-        line = line.lstrip().lstrip('#').lstrip()
+      if ls.startswith('#'):
+        if no_comments or keyvar: continue
+        # Create `_COMMENT_?` variable from lines starting with '#';
+        # lstrip('#') consumes all leading '#'s in one pass
         comment_n+=1
-        variables[f'_COMMENT_{comment_n}'] = line
+        variables[f'_COMMENT_{comment_n}'] = ls.lstrip('#').lstrip()
         continue
 
-      match = key_value_pattern.match(line)
-      if match:
+      # the key is everything before the first separator, and must 
+      # be an ASCII identifier, ie, [a-zA-Z_][a-zA-Z0-9_]*
+      idx = line.find(keyval_sep)
+      key = line[:idx].rstrip() if idx > 0 else ''
+      if key.isascii() and key.isidentifier():
         # A new variable declaration
-        current_var_name  = match.group(1).strip()
-        # check for duplicate keys
-        if current_var_name in variables:
-          errmsg = f"Duplicate key '{current_var_name}' in {source}"
-          if verbose or strict: print(errmsg, file=sys.stderr)
-          if strict:
-            raise StructuredTextError(errmsg)
-          ERRORS += errmsg + '\n'
-        current_var_value = match.group(2).strip()
+        current_var_name  = key
+        if current_var_name in variables: duplicate_key(current_var_name)
+        current_var_value = line[idx + sep_len:].strip()
         if current_var_value == '"""':
           # We have entered a multiline variable declaration
-          current_var_value = ''
           multiline         = True
-        else:
-          if keyvar:
-            if current_var_name in keyvars:
-              variables[current_var_name] = current_var_value
-              keyvars.remove(current_var_name)
-              # shortcut exit if keyvars is now empty 
-              if not keyvars: return variables
+          # the body of a value not among keyvars is skipped, not kept
+          keep              = not keyvar or current_var_name in keyvars_remaining
+          for line in line_iter:
+            if line.strip() == '"""':
+              # a line containing only """ marks the end of a 
+              # multiline variable
+              multiline = False
+              break
+            if keep and (line or current_var_chunks):
+              # leading empty lines of a multiline value are dropped
+              append_chunk(line)
           else:
-            variables[current_var_name] = current_var_value
-          current_var_name  = ''
-          current_var_value = ''
+            # input ended inside the multiline value; it is dropped
+            break
+          current_var_value = '\n'.join(current_var_chunks)
+          current_var_chunks.clear()
+        # shortcut exit if keyvars is now empty 
+        if store(current_var_name, current_var_value): return variables
+        current_var_name  = ''
+        current_var_value = ''
       else:
         # line contains no key, dump to FREETEXT if not strict mode
-        errmsg = f"No variable key in '{line[:40]}...' in {source}"
-        if (verbose or strict) and not keyvar: 
-          print(errmsg, file=sys.stderr)
-        if strict:
-          raise StructuredTextError(errmsg)
-        ERRORS += errmsg + '\n'
-        FREETEXT += line.replace('"""', '\\"\\"\\"') + '\n'
-
-  # Capture any trailing variable not terminated by """
-  if current_var_name and not multiline:
-    variables[current_var_name] = current_var_value.strip()
-
-  """ If no variables were initialised, then assign entire 
-      input_source contents to special variable FREETEXT """
-  if not variables:
-    errmsg = f"No key variables found in {source}"
-    if verbose or strict:
-      print(errmsg, file=sys.stderr)
-    if strict:
-      raise StructuredTextError(errmsg)
-    if verbose: ERRORS += errmsg + '\n'
-    FREETEXT = file_content
-
-  if keyvars:
-    """ 
-    There's still content in the keyvars array, meaning not
-    found 
-    """
-    errmsg = f"Variable/s '{keyvars}' not found in {source}."
-    if verbose or strict: print(errmsg, file=sys.stderr)
-    if strict:
-      raise StructuredTextError(errmsg)
-    ERRORS += errmsg + '\n'
-    return {}
-
-  if delvars:
-    for key in delvars:
-      if key in variables:
-        del variables[key]
+        no_key(line, line)
+
+    # embedded """ are escaped in one pass over the joined text; 
+    # joining on '\n' cannot create new occurrences
+    FREETEXT = '\n'.join(freetext_chunks).replace('"""', '\\"\\"\\"')
+
+    # Capture any trailing variable not terminated by """
+    if current_var_name and not multiline:
+      variables[current_var_name] = current_var_value.strip()
+
+    """ If no variables were initialised, then assign entire 
+        input_source contents to special variable FREETEXT """
+    if not variables:
+      errmsg = f"No key variables found in {source}"
+      if verbose or strict:
+        stderr_msgs.append(errmsg + '\n')
+      if strict:
+        raise StructuredTextError(errmsg)
+      if verbose: errors.append(errmsg)
+      # free text is never returned when selecting keyvars
+      if not keyvar and isinstance(input_source, (str, os.PathLike)):
+        # the file is only read in whole for this fallback
+        with open(input_source, 'r', buffering=_IO_BUFFER_SIZE) as f:
+          FREETEXT = f.read()
+      elif not keyvar and isinstance(input_source, list):
+        FREETEXT = '\n'.join(lines)
+
+    if keyvars_remaining:
+      """ 
+      There's still content in the keyvars set, meaning not
+      found 
+      """
+      missing = [key for key in keyvars if key in keyvars_remaining]
+      errmsg = f"Variable/s '{missing}' not found in {source}."
+      if verbose or strict: stderr_msgs.append(errmsg + '\n')
+      if strict:
+        raise StructuredTextError(errmsg)
+      errors.append(errmsg)
+      return {}
+
+    if delvars:
+      for key in delvars:
+        if variables.pop(key, None) is None:
+          errmsg = f"Variable '{key}' could not be deleted from {source}."
+          if verbose or strict: stderr_msgs.append(errmsg + '\n')
+          errors.append(errmsg)
+
+    # If non-key:value text lines were found, then store them in 
+    # special key variable freetext_name, after any free text 
+    # already held in _FREETEXT_, _TEXT_ or freetext_name.
+    FREETEXT = FREETEXT.strip()
+    if FREETEXT:
+      text = variables.pop('_TEXT_', '')
+      if '_FREETEXT_' in variables:
+        prior = variables.pop('_FREETEXT_')
       else:
-        errmsg = f"Variable '{key}' could not be deleted from {source}."
-        if verbose or strict: print(errmsg, file=sys.stderr)
-        ERRORS += errmsg + '\n'
-
-  # If non-key:value text lines were found, then store them in 
-  # special key variable _FREETEXT_
-  if FREETEXT.strip():
-    if '_TEXT_' in variables:
-      FREETEXT = variables['_TEXT_'].strip() + '\n' + FREETEXT.strip()
-      del variables['_TEXT_']
-    if '_FREETEXT_' in variables:
-      FREETEXT = variables['_FREETEXT_'].strip() + '\n' + FREETEXT.strip()
-      del variables['_FREETEXT_']
-    elif freetext_name in variables:
-      FREETEXT = variables[freetext_name].strip() + '\n' + FREETEXT.strip()
-    variables[freetext_name] = FREETEXT.strip()
-
-  # If error messages were generated, then store them in 
-  # special key variable _ERRORS_.
-  if '_ERRORS_' in variables:
-    # Delete any previous _ERRORS_ in input_source
-    del variables['_ERRORS_']
-  if ERRORS.strip() and not no_errors:
-    variables['_ERRORS_'] = ERRORS.strip()
-
-  return variables
+        prior = variables.get(freetext_name, '')
+      variables[freetext_name] = '\n'.join(
+          filter(None, (prior.strip(), text.strip(), FREETEXT)))
+
+    # Delete any previous _ERRORS_ in input_source, then store any
+    # error messages generated in special key variable _ERRORS_.
+    variables.pop('_ERRORS_', None)
+    if errors and not no_errors:
+      variables['_ERRORS_'] = '\n'.join(errors)
+
+    return variables
+  finally:
+    if stderr_msgs: sys.stderr.writelines(stderr_msgs)
+
+
+def extract_many(
+    paths: list[str], 
+    *, 
+    workers: int | None = 1,
+    **kwargs
+  ) -> dict:
+  """
+    Extract StructuredText variables from each file in `paths`.
+
+    Keyword arguments are passed through to `extract`. 
+    Returns a `dict` of `{path: extract(path, **kwargs)}`.
+
+    With `workers` other than 1, files are parsed in parallel by a
+    pool of that many processes (`None` for one per CPU).
+  """
+  if workers == 1 or len(paths) < 2:
+    return {path: extract(path, **kwargs) for path in paths}
+  # imported here so that importing the module stays cheap
+  from concurrent.futures import ProcessPoolExecutor
+  with ProcessPoolExecutor(max_workers=workers) as executor:
+    results = executor.map(functools.partial(extract, **kwargs), paths, 
+                           chunksize=16)
+    return dict(zip(paths, results))
+
+
+@functools.lru_cache(maxsize=128)
+def _extract_file_cached(path, realpath:str, mtime_ns:int, size:int, kw:tuple) -> dict:
+  """ `extract` a file, memoized by `extract_cached`. """
+  return extract(path, **dict(kw))
+
+def extract_cached(
+    input_source: str | os.PathLike | dict | list[str],
+    **kwargs
+  ) -> dict:
+  """
+    As `extract`, but results for file input are memoized per
+    process, keyed by the path given, the file's real path, mtime 
+    and size, and the keyword arguments. A changed file is parsed 
+    again.
+
+    Each call returns a fresh copy of the cached `dict`. Warnings
+    are only printed to stderr when the file is actually parsed.
+  """
+  if not isinstance(input_source, (str, os.PathLike)):
+    return extract(input_source, **kwargs)
+  try:
+    stat = os.stat(input_source)
+  except OSError:
+    return extract(input_source, **kwargs)
+  kw = tuple(sorted((key, tuple(value) if isinstance(value, list) else value)
+                    for key, value in kwargs.items()))
+  return dict(_extract_file_cached(input_source, os.path.realpath(input_source),
+                                   stat.st_mtime_ns, stat.st_size, kw))
 
 
 def write_dict_to_st(
-    variables:dict, 
+    variables:dict | list[tuple[str, str]], 
     *, 
     keyvar:str      = None, 
     keyval_sep:str  = ':',    
@@ -385,42 +550,58 @@ def write_dict_to_st(
   """
     Print out all key variables in 'dict' to 
     StructuredText format to file or stdout. 
+    `variables` may also be an iterable of (key, value) pairs,
+    which are written in order without building a dict.
   """
   hfile    = open(filename, 'w') if filename else sys.stdout 
   printend = '\n' * max(0, lf)
   sepc     = ' '  * max(0, sep)
-  for key, value in variables.items():
-    if keyvar:
-      if keyvar != key: continue
+  if keyvar:
+    # a single keyvar is looked up directly, not searched for
+    if not isinstance(variables, dict): variables = dict(variables)
+    if keyvar in variables:
+      key, value = keyvar, variables[keyvar]
       if '\n' in value:
         # guard for nested terminating """
         valueq = value.replace('"""\n', '\"\"\"\n')
-        print(f'{key}{keyval_sep}{sepc}\"\"\"\n{valueq}\n\"\"\"', end=printend, file=hfile)
+        text = f'{key}{keyval_sep}{sepc}\"\"\"\n{valueq}\n\"\"\"{printend}'
       elif key.startswith('_COMMENT_'):
-        print(f'#{sepc}{value}', end=printend, file=hfile)
+        text = f'#{sepc}{value}{printend}'
       else:
-        print(f'{key}{keyval_sep}{sepc}{value}', end=printend, file=hfile)
-      if filename: hfile.close()
-      return True
+        text = f'{key}{keyval_sep}{sepc}{value}{printend}'
+      hfile.write(text)
+    if filename: hfile.close()
+    return True
+  # Output is rendered into `parts` and written in large blocks 
+  # rather than with one print() per key.
+  parts:list[str] = []
+  size:int        = 0
+  items = variables.items() if isinstance(variables, dict) else variables
+  for key, value in items:
     if '\n' in value:
       if not multiline:
         #valueq = value.replace('"', '\\"')
         valueq = value.replace('\n', '\n').replace('"', '\\"')
-        print(f"{key}{keyval_sep}{sepc}\"" +valueq+"\"", end=printend, file=hfile)
+        text = f"{key}{keyval_sep}{sepc}\"" +valueq+"\"" + printend
       else:
         valueq = value.replace('"""\n', '\"\"\"\n')
-        print(f'{key}{keyval_sep}{sepc}\"\"\"\n{valueq}\n\"\"\"', end=printend, file=hfile)
+        text = f'{key}{keyval_sep}{sepc}\"\"\"\n{valueq}\n\"\"\"{printend}'
     elif key.startswith('_COMMENT_'):
       # comments are kept together
-      print(f'#{sepc}{value}', 
-        end=('n' if len(printend) else printend), 
-        file=hfile)
+      text = f'#{sepc}{value}' + ('\n' if printend else '')
     else:
       qt=''
       if (not multiline) and ' ' in value:
          value = value.replace('"', '\\"')
          qt='"'
-      print(f'{key}{keyval_sep}{sepc}{qt}{value}{qt}', end=printend, file=hfile)
+      text = f'{key}{keyval_sep}{sepc}{qt}{value}{qt}{printend}'
+    parts.append(text)
+    size += len(text)
+    if size >= _IO_BUFFER_SIZE:
+      hfile.write(''.join(parts))
+      parts.clear()
+      size = 0
+  hfile.write(''.join(parts))
   if filename: hfile.close()
   return True
 
@@ -1,4 +1,7 @@
 import unittest
+import os
+import pathlib
+import tempfile
 import StructuredText as st
 
 class TestStructuredText(unittest.TestCase):
@@ -20,6 +23,20 @@ class TestStructuredText(unittest.TestCase):
     self.assertEqual(result['KEY1'], 'value1')
     self.assertEqual(result['KEY2'], 'Multi-line\nvalue')
 
+  def test_extract_from_dict(self):
+    # Test extracting from a dict, with keys validated as for lines
+    variables = {'KEY1 ': ' value1 ', 'KEY2': 'Multi-line\nvalue', 1: 'a', 'bad key': 'b'}
+    result = st.extract(variables, quiet=True)
+    self.assertEqual(result['KEY1'], 'value1')
+    self.assertEqual(result['KEY2'], 'Multi-line\nvalue')
+    self.assertEqual(result['_FREETEXT_'], '1:a\nbad key:b')
+    self.assertIn("No variable key in '1:a...'", result['_ERRORS_'])
+    self.assertEqual(st.extract(variables, keyvars=['KEY1']), {'KEY1': 'value1'})
+    # a multiline item without a valid key is one line of _ERRORS_
+    result = st.extract({'bad key': 'a\r\nb\nc', 'OK': 'v'}, quiet=True)
+    self.assertEqual(result['_FREETEXT_'], 'bad key:a\nb\nc')
+    self.assertEqual(result['_ERRORS_'], "No variable key in 'bad key:a...' in dictionary")
+
   def test_extract_with_strict_mode(self):
     # Test strict mode with invalid content
     lines = [
@@ -30,6 +47,50 @@ class TestStructuredText(unittest.TestCase):
     with self.assertRaises(Exception): # Assuming custom exception is implemented
       st.extract(lines, strict=True)
 
+  def test_extract_from_path(self):
+    # Test extracting from a path-like input_source
+    result = st.extract(pathlib.Path('test01.transcript.txt'))
+    self.assertEqual(result['ID'], 'e0WZx7lUOrY')
+    result = st.extract(pathlib.Path('test02.loose.transcript.txt'), quiet=True)
+    self.assertTrue(result['_FREETEXT_'].startswith('Stanford University.'))
+
+  def test_extract_file_in_small_blocks(self):
+    # Test that lines split across file read blocks are rejoined,
+    # for every line break str.splitlines() recognises
+    text = 'A: 1\n\nB: """\nx\x0by\x85z\n"""\nfree\u2028text\r\nC: 3\x1cD: 4\n\nE: last'
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'blocks.st')
+      with open(path, 'w', newline='') as file:
+        file.write(text)
+      expected = st.extract(path, quiet=True)
+      self.addCleanup(setattr, st, '_IO_BUFFER_SIZE', st._IO_BUFFER_SIZE)
+      for size in range(1, 9):
+        st._IO_BUFFER_SIZE = size
+        self.assertEqual(st.extract(path, quiet=True), expected)
+    self.assertEqual(expected['E'], 'last')
+
+  def test_extract_many(self):
+    # Test extracting from several files in one call
+    paths = ['test01.transcript.txt', 'test02.loose.transcript.txt']
+    result = st.extract_many(paths, keyvars=['TITLE'], quiet=True)
+    self.assertEqual(list(result), paths)
+    self.assertEqual(result[paths[0]], {'TITLE': '6. Behavioral Genetics I'})
+    self.assertEqual(result[paths[1]], {})
+    # and in parallel
+    self.assertEqual(st.extract_many(paths, workers=2, keyvars=['TITLE'], quiet=True), result)
+
+  def test_extract_cached(self):
+    # Test that cached results match extract and are safe to modify
+    path = 'test01.transcript.txt'
+    result = st.extract_cached(path, keyvars=['TITLE'], quiet=True)
+    self.assertEqual(result, st.extract(path, keyvars=['TITLE'], quiet=True))
+    result['TITLE'] = 'changed'
+    self.assertEqual(st.extract_cached(path, keyvars=['TITLE'], quiet=True),
+                     {'TITLE': '6. Behavioral Genetics I'})
+    # messages in _ERRORS_ name the file as given
+    path = 'test02.loose.transcript.txt'
+    self.assertEqual(st.extract_cached(path, quiet=True), st.extract(path, quiet=True))
+
   def test_write_to_file(self):
     # Test writing to a file
     variables = {'KEY1': 'value1', 'KEY2': 'value2'}
@@ -39,6 +100,17 @@ class TestStructuredText(unittest.TestCase):
     self.assertIn('KEY1: value1', content)
     self.assertIn('KEY2: value2', content)
 
+  def test_write_pairs_to_file(self):
+    # Test writing (key, value) pairs rather than a dict
+    pairs = [('KEY1', 'value1'), ('KEY2', 'value2')]
+    st.write_dict_to_st(pairs, filename='output_file.st')
+    with open('output_file.st', 'r') as file:
+      content = file.read()
+    self.assertEqual(content, 'KEY1: value1\n\nKEY2: value2\n\n')
+    st.write_dict_to_st(iter(pairs), keyvar='KEY2', filename='output_file.st')
+    with open('output_file.st', 'r') as file:
+      self.assertEqual(file.read(), 'KEY2: value2\n\n')
+
   def test_write_multiline_value(self):
     # Test writing multi-line value
     variables = {'KEY_MULTILINE': '"""This is\na multi-line\nvalue"""'}